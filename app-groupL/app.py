@@ -1,34 +1,413 @@
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, render_template, stream_template, Response, make_response, request, redirect, url_for, g
+from flask_caching import Cache
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.exceptions import HTTPException
+import hashlib
 import sqlite3
 import os
+import time
 
 app = Flask(__name__)
 
+# FLASK_ENV=dev (or development) turns on the debugger and template reloading; everything else runs as production
+DEBUG = os.getenv('FLASK_ENV') in ('dev', 'development')
+
+# Compiled templates are cached on disk so a fresh process/worker skips re-parsing them,
+# and templates are only re-checked for changes in dev. With no directory argument Jinja uses
+# a per-user 0700 temp dir and refuses it if the owner or mode is wrong (cache files are code).
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+app.config['TEMPLATES_AUTO_RELOAD'] = DEBUG
+app.jinja_env.auto_reload = DEBUG
+
+# Dashboard aggregates change rarely, so their query helpers are memoized for a minute.
+# Any route that writes to the underlying tables should call cache.delete_memoized(<helper>).
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 60})
+
 # DATABASE CONNECTION
 DB_PATH = 'hotel_last_resort.db'
 
-def get_db_connection():
+# per-connection tuning; journal_mode is stored in the db file so it is set once in init_db
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",      # 64 MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",    # 256 MB
+)
+
+# covering indexes for the join/group columns the dashboard queries hit
+# (single-column FK indexes like billing(customerId) and transaction(transactionDate) already ship in the db)
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS ix_billing_customer_amount ON billing(customerId, totalAmount)',
+    'CREATE INDEX IF NOT EXISTS ix_resroom_room_res ON reservation_room(roomId, reservationId)',
+    'CREATE INDEX IF NOT EXISTS ix_reading_card_reader ON reading_info(staffcardId, readerID)',
+    'CREATE INDEX IF NOT EXISTS ix_sca_card_staff ON staff_card_assignment(staffcardId, staffId)',
+    'CREATE INDEX IF NOT EXISTS ix_eventres_res_event ON event_reservation(reservationId, eventId)',
+    'CREATE INDEX IF NOT EXISTS ix_res_day ON reservation(date(startDateTime))',
+    'CREATE INDEX IF NOT EXISTS ix_tx_ym ON "transaction"(substr(transactionDate, 1, 7), amount)',
+)
+
+# tables behind the read-only pages that send an ETag; triggers bump their row in table_version
+VERSIONED_TABLES = ('staff', 'room', 'building', 'room_type', 'bed_type', 'room_status', 'meeting_space')
+
+def init_db():
+    # runs once at startup: switch the db file to WAL so readers don't block on the journal,
+    # make sure the dashboard indexes exist, and install the table_version triggers
     conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row   # lets us treat rows like dicts
-    return conn
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        for index in INDEXES:
+            conn.execute(index)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS table_version (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        for table in VERSIONED_TABLES:
+            conn.execute('INSERT OR IGNORE INTO table_version (table_name) VALUES (?)', (table,))
+            for op in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_version AFTER {op} ON "{table}"
+                    BEGIN
+                        UPDATE table_version SET version = version + 1 WHERE table_name = '{table}';
+                    END
+                ''')
+        conn.commit()
+    finally:
+        conn.close()
+
+# pooled connections shared across requests/threads of a worker, so connect + PRAGMA cost is paid once per connection
+engine = create_engine('sqlite:///' + DB_PATH, poolclass=QueuePool, pool_size=5, max_overflow=10,
+                       connect_args={'check_same_thread': False, 'cached_statements': 256})
+
+@event.listens_for(engine, 'connect')
+def setup_connection(dbapi_conn, connection_record):
+    dbapi_conn.row_factory = sqlite3.Row   # lets us treat rows like dicts
+    for pragma in CONNECTION_PRAGMAS:
+        dbapi_conn.execute(pragma)
 
-def query_db(query, args=(), one=False):
-    conn = get_db_connection()
+def get_db():
+    # one pooled connection per request, reused by every query_db call in that request
+    if '_db' not in g:
+        g._db = engine.raw_connection()
+    return g._db.driver_connection
+
+@app.teardown_appcontext
+def close_db(exc):
+    db = g.pop('_db', None)
+    if db is not None:
+        db.close()   # returns the connection to the pool
+
+init_db()
+
+def query_db(query, args=(), one=False, conn=None):
     if conn is None:
-        return [] if not one else None
+        conn = get_db()
     try:
         cursor = conn.cursor()
         cursor.execute(query, args)
-        results = cursor.fetchall()
-        # Convert Row objects to dictionaries
-        dict_results = [dict(row) for row in results]
-        return (dict_results[0] if dict_results else None) if one else dict_results
+        if one:
+            return cursor.fetchone()
+        # sqlite3.Row already supports row['col'] (and row.col in templates), no dict copy needed
+        return cursor.fetchall()
+    except sqlite3.OperationalError:
+        raise   # busy/locked db or bad SQL: handle_db_error decides between 503 and 500
     except sqlite3.Error as e:
         print(f"Query error: {e}")
         return [] if not one else None
-    finally:
-        conn.close()
 
+def iter_rows(cursor, size=1024):
+    # pull rows in fetchmany batches: only one batch is held in memory at a time
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+def iter_db(query, args=(), conn=None):
+    # like query_db but returns an iterator over the cursor's rows in batches, so a streamed
+    # template starts rendering without building the full result list first.
+    # The query runs now, on the request connection; pair it with stream_page.
+    if conn is None:
+        conn = get_db()
+    try:
+        return iter_rows(conn.execute(query, args))
+    except sqlite3.OperationalError:
+        raise
+    except sqlite3.Error as e:
+        print(f"Query error: {e}")
+        return iter(())
+
+def stream_page(template, **context):
+    # teardown_appcontext runs as soon as the view returns, before Jinja pulls the iter_db rows,
+    # so the request connection is handed to the response and returned to the pool when it closes
+    db = g.pop('_db', None)
+    resp = Response(stream_template(template, **context), mimetype='text/html')
+    if db is not None:
+        resp.call_on_close(db.close)
+    return resp
+
+
+# QUERIES
+# Kept as module-level constants so the exact same SQL text is passed on every call
+# and sqlite3's per-connection statement cache reuses the prepared statement.
+
+# Number of available sleeping rooms (header of the guest rooms page)
+SQL_GUEST_ROOM_COUNT = '''
+    SELECT COUNT(*) AS total_rooms
+    FROM room AS rm
+    JOIN room_status AS rs ON rs.roomStatusId = rm.roomStatusId
+    WHERE rs.status = 'available'
+      AND NOT EXISTS (SELECT 1 FROM meeting_space AS ms WHERE ms.roomId = rm.roomId)
+'''
+
+# Query available sleeping rooms (not meeting spaces)
+SQL_GUEST_ROOMS = '''
+    SELECT rm.roomId, rm.roomNumber, b.buildingName, rt.roomType, bt.bedType,
+           rm.squareFootage, rm.hasPaidBar, rs.status AS room_status
+    FROM room AS rm
+    JOIN building AS b ON b.buildingId = rm.buildingId
+    JOIN room_type AS rt ON rt.roomTypeId = rm.roomTypeId
+    LEFT JOIN bed_type AS bt ON bt.bedTypeId = rm.bedTypeId
+    JOIN room_status AS rs ON rs.roomStatusId = rm.roomStatusId
+    WHERE rs.status = 'available'
+      AND NOT EXISTS (SELECT 1 FROM meeting_space AS ms WHERE ms.roomId = rm.roomId)
+    ORDER BY b.buildingName, rm.roomNumber
+'''
+
+# Query meeting spaces with amenities
+SQL_MEETING_SPACES = '''
+    SELECT ms.roomId, rm.roomNumber, b.buildingName, ms.spaceType, ms.capacity,
+           ms.hasProjector, ms.hasWhiteboard, ms.hasPaidBar
+    FROM meeting_space AS ms
+    JOIN room AS rm ON rm.roomId = ms.roomId
+    JOIN building AS b ON b.buildingId = rm.buildingId
+    ORDER BY ms.spaceType, rm.roomNumber
+'''
+
+# Query 1: Reservations per day (by check-in date) - limited to 10
+SQL_RECENT_RESERVATIONS = '''
+    SELECT
+    date(r.startDateTime) AS day,
+    COUNT(*) AS num_reservations
+    FROM reservation AS r
+    GROUP BY date(r.startDateTime)
+    ORDER BY day DESC
+    LIMIT 10
+'''
+
+# Get room types for dropdown (both sleeping rooms and meeting spaces)
+# rooms sort ahead of meeting spaces ('room' > 'meeting')
+SQL_BOOKING_TYPES = '''
+    SELECT DISTINCT rt.roomType AS roomType, 'room' AS type_category
+    FROM room_type AS rt
+    UNION ALL
+    SELECT DISTINCT ms.spaceType AS roomType, 'meeting' AS type_category
+    FROM meeting_space AS ms
+    ORDER BY type_category DESC, roomType
+'''
+
+# Total and active staff counts for the roster footer
+SQL_STAFF_STATS = '''
+    SELECT COUNT(*) AS total_staff,
+    COALESCE(SUM(s.isActive <> 0), 0) AS active_staff
+    FROM staff AS s
+'''
+
+# Query staff list with their information
+SQL_STAFF_ROSTER = '''
+    SELECT s.staffId, s.firstName, s.lastName, s.email, s.phone,
+           s.role, s.department, s.hireDate, s.isActive
+    FROM staff AS s
+    ORDER BY s.department, s.lastName, s.firstName
+'''
+
+# Query 8: Staff door-reader swipes by department and reader location
+# (SQLite has no COUNT(DISTINCT) window, so the distinct counts read from the grouped CTE)
+SQL_CARD_SWIPES = '''
+    WITH swipes AS (
+        SELECT s.department, rd.location,
+        COUNT(*) AS staff_swipes
+        FROM reading_info AS ri
+        JOIN staff_card_assignment AS sca ON sca.staffcardId = ri.staffcardId
+        JOIN staff AS s ON s.staffId = sca.staffId
+        JOIN readers AS rd ON rd.readersId = ri.readerID
+        GROUP BY s.department, rd.location
+    )
+    SELECT department, location, staff_swipes,
+    SUM(staff_swipes) OVER () AS total_swipes,
+    (SELECT COUNT(DISTINCT department) FROM swipes) AS departments,
+    (SELECT COUNT(DISTINCT location) FROM swipes) AS locations
+    FROM swipes
+    ORDER BY staff_swipes DESC
+'''
+
+# Query 7: Open customer requests by request type
+SQL_OPEN_REQUESTS = '''
+    SELECT cr.depositStatus,
+    COUNT(*) AS open_requests,
+    SUM(COUNT(*)) OVER () AS total_requests
+    FROM customer_requests AS cr
+    WHERE cr.resolved = 'N'
+    GROUP BY cr.depositStatus
+    ORDER BY open_requests DESC
+'''
+
+# Query 3: Average stay length by room type
+SQL_STAY_LENGTH = '''
+    SELECT rt.roomType,
+    AVG(julianday(r.endDateTime) - julianday(r.startDateTime)) AS avg_nights,
+    COUNT(*) AS num_room_bookings,
+    SUM(COUNT(*)) OVER () AS total_bookings
+    FROM room_type AS rt
+    JOIN room AS rm ON rm.roomTypeId = rt.roomTypeId
+    JOIN reservation_room AS rr ON rr.roomId = rm.roomId
+    JOIN reservation AS r ON r.reservationId = rr.reservationId
+    GROUP BY rt.roomType
+    ORDER BY avg_nights DESC
+'''
+
+# Query 6: Meeting-space events by space type
+SQL_SPACE_EVENTS = '''
+    SELECT ms.spaceType,
+    COUNT(DISTINCT er.eventId) AS events_count,
+    SUM(COUNT(DISTINCT er.eventId)) OVER () AS total_events
+    FROM meeting_space AS ms
+    LEFT JOIN reservation_room AS rr ON rr.roomId = ms.roomId
+    LEFT JOIN event_reservation AS er ON er.reservationId = rr.reservationId
+    LEFT JOIN event AS e ON e.eventId = er.eventId
+    GROUP BY ms.spaceType
+    ORDER BY ms.spaceType
+'''
+
+# Query 5: Revenue by customer (billing totals), one page at a time
+SQL_CUSTOMER_BILLING = '''
+    SELECT c.customerId,
+    c.lastName AS last_name,
+    c.firstName AS first_name,
+    COUNT(*) AS bills,
+    SUM(b.totalAmount) AS total_billed
+    FROM billing AS b
+    JOIN customer AS c ON c.customerId = b.customerId
+    GROUP BY c.customerId, c.lastName, c.firstName
+    ORDER BY total_billed DESC, c.customerId
+    LIMIT :size OFFSET :offset
+'''
+
+# Customer count and revenue across all pages of Query 5
+SQL_CUSTOMER_BILLING_TOTALS = '''
+    SELECT COUNT(DISTINCT b.customerId) AS total_customers,
+    COALESCE(SUM(b.totalAmount), 0) AS total_revenue
+    FROM billing AS b
+    JOIN customer AS c ON c.customerId = b.customerId
+'''
+
+# Query 2: Room counts by status for each building
+SQL_ROOM_STATUS_COUNTS = '''
+    WITH agg AS (
+        SELECT b.buildingName,
+        rs.status AS room_status,
+        COUNT(*) AS num_rooms
+        FROM building AS b
+        JOIN room AS rm ON rm.buildingId = b.buildingId
+        JOIN room_status AS rs ON rs.roomStatusId = rm.roomStatusId
+        GROUP BY b.buildingName, rs.status
+    )
+    SELECT *,
+    (SELECT SUM(num_rooms) FROM agg) AS total_rooms,
+    (SELECT SUM(CASE WHEN room_status = 'available' THEN num_rooms ELSE 0 END) FROM agg) AS available_rooms
+    FROM agg
+    ORDER BY buildingName, num_rooms DESC
+'''
+
+# Query 1: Reservations per day (by check-in date)
+SQL_RESERVATIONS_PER_DAY = '''
+    SELECT
+    date(r.startDateTime) AS day,
+    COUNT(*) AS num_reservations,
+    SUM(COUNT(*)) OVER () AS total_reservations,
+    COUNT(*) OVER () AS total_days
+    FROM reservation AS r
+    GROUP BY date(r.startDateTime)
+    ORDER BY day
+'''
+
+# Query 4: Monthly revenue from transactions
+# (ym is the 'YYYY-MM' prefix of the timestamp; the template splits it into year and month)
+SQL_MONTHLY_REVENUE = '''
+    SELECT
+    substr(t.transactionDate, 1, 7) AS ym,
+    SUM(t.amount) AS total_revenue,
+    COUNT(*) AS num_tx,
+    SUM(SUM(t.amount)) OVER () AS all_revenue,
+    SUM(COUNT(*)) OVER () AS all_transactions,
+    COUNT(*) OVER () AS months_tracked
+    FROM "transaction" AS t
+    GROUP BY substr(t.transactionDate, 1, 7)
+    ORDER BY ym
+'''
+
+# Change counters for the ETag pages
+SQL_TABLE_VERSIONS = '''
+    SELECT table_name, version
+    FROM table_version
+'''
+
+# Query 9: Rooms that have never been reserved
+SQL_ROOMS_NEVER_RESERVED = '''
+    SELECT b.buildingName, rm.roomNumber
+    FROM building AS b
+    JOIN room AS rm ON rm.buildingId = b.buildingId
+    WHERE NOT EXISTS (SELECT 1 FROM reservation_room AS rr WHERE rr.roomId = rm.roomId)
+    ORDER BY b.buildingName, rm.roomNumber
+'''
+
+
+def page_args(total, default_size=25, max_size=100):
+    # ?page=N&size=M from the query string, clamped to sane values; page never goes past the last page
+    size = min(max(request.args.get('size', default_size, type=int), 1), max_size)
+    total_pages = max(-(-total // size), 1)
+    page = min(max(request.args.get('page', 1, type=int), 1), total_pages)
+    return page, size, total_pages
+
+def code_version():
+    # hash of app.py and the templates: the same in every worker, and different after any deploy
+    # that changes how a page renders, so it is folded into every ETag
+    h = hashlib.blake2b(digest_size=8)
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for path in [os.path.abspath(__file__)] + [os.path.join(template_dir, n) for n in sorted(os.listdir(template_dir))]:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+ETAG_SALT = code_version()
+
+def conditional_page(tables, render):
+    # Sends an ETag derived from the code version and table_version for `tables`, and answers a
+    # matching conditional GET with 304 before running the page's queries or template.
+    # (No Last-Modified: a timestamp can't reflect a template change, so If-Modified-Since would serve stale 304s.)
+    versions = {row['table_name']: row['version'] for row in query_db(SQL_TABLE_VERSIONS)}
+    key = ETAG_SALT + ''.join(f"|{t}:{versions[t]}" for t in tables)
+    etag = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    resp = Response()
+    resp.set_etag(etag)
+    resp.make_conditional(request)
+    if resp.status_code == 304:
+        return resp
+    resp = make_response(render())
+    resp.set_etag(etag)
+    return resp
+
+@cache.memoize(timeout=60)
+def _customer_billing_rows(page, size):
+    rows = query_db(SQL_CUSTOMER_BILLING, {'size': size, 'offset': (page - 1) * size})
+    return [dict(row) for row in rows]   # Row objects can't be pickled into the cache
+
+@cache.memoize(timeout=60)
+def _customer_billing_totals():
+    return dict(query_db(SQL_CUSTOMER_BILLING_TOTALS, one=True))
 
 
 # CUSTOMER ROUTES
@@ -43,18 +422,10 @@ def signup():
 @app.route('/account')
 def account():
     # Query 5: Revenue by customer (billing totals)
-    reservations = query_db('''
-        SELECT c.customerId,
-        c.lastName AS last_name,
-        c.firstName AS first_name,
-        COUNT(*) AS bills,
-        SUM(b.totalAmount) AS total_billed
-        FROM billing AS b
-        JOIN customer AS c ON c.customerId = b.customerId
-        GROUP BY c.customerId, c.lastName, c.firstName
-        ORDER BY total_billed DESC
-    ''')
-    return render_template('account.html', reservations=reservations)
+    page, size, total_pages = page_args(_customer_billing_totals()['total_customers'])
+    reservations = _customer_billing_rows(page, size)
+    return render_template('account.html', reservations=reservations,
+                          page=page, size=size, total_pages=total_pages)
 
 @app.route('/profile')
 def profile():
@@ -62,66 +433,32 @@ def profile():
 
 @app.route('/guest_rooms')
 def guest_rooms():
-    # Query available sleeping rooms (not meeting spaces)
-    available_rooms = query_db('''
-        SELECT rm.roomId, rm.roomNumber, b.buildingName, rt.roomType, bt.bedType,
-               rm.squareFootage, rm.hasPaidBar, rs.status AS room_status
-        FROM room AS rm
-        JOIN building AS b ON b.buildingId = rm.buildingId
-        JOIN room_type AS rt ON rt.roomTypeId = rm.roomTypeId
-        LEFT JOIN bed_type AS bt ON bt.bedTypeId = rm.bedTypeId
-        JOIN room_status AS rs ON rs.roomStatusId = rm.roomStatusId
-        LEFT JOIN meeting_space AS ms ON ms.roomId = rm.roomId
-        WHERE ms.roomId IS NULL AND rs.status = 'available'
-        ORDER BY b.buildingName, rm.roomNumber
-    ''')
-    total_rooms = len(available_rooms) if available_rooms else 0
-    return render_template('guest_rooms.html', available_rooms=available_rooms, total_rooms=total_rooms)
+    def render():
+        # Count first so the header can render before the rows stream in;
+        # one read transaction so the count and the rows come from the same snapshot
+        get_db().execute("BEGIN")
+        total_rooms = query_db(SQL_GUEST_ROOM_COUNT, one=True)['total_rooms']
+        available_rooms = iter_db(SQL_GUEST_ROOMS)
+        return stream_page('guest_rooms.html', available_rooms=available_rooms, total_rooms=total_rooms)
+    return conditional_page(('room', 'building', 'room_type', 'bed_type', 'room_status', 'meeting_space'), render)
 
 @app.route('/meeting_spaces')
 def meeting_spaces_page():
-    # Query meeting spaces with amenities
-    meeting_spaces = query_db('''
-        SELECT ms.roomId, rm.roomNumber, b.buildingName, ms.spaceType, ms.capacity,
-               ms.hasProjector, ms.hasWhiteboard, ms.hasPaidBar
-        FROM meeting_space AS ms
-        JOIN room AS rm ON rm.roomId = ms.roomId
-        JOIN building AS b ON b.buildingId = rm.buildingId
-        ORDER BY ms.spaceType, rm.roomNumber
-    ''')
-    total_spaces = len(meeting_spaces) if meeting_spaces else 0
-    return render_template('meeting_spaces.html', meeting_spaces=meeting_spaces, total_spaces=total_spaces)
+    def render():
+        meeting_spaces = query_db(SQL_MEETING_SPACES)
+        total_spaces = len(meeting_spaces) if meeting_spaces else 0
+        return render_template('meeting_spaces.html', meeting_spaces=meeting_spaces, total_spaces=total_spaces)
+    return conditional_page(('meeting_space', 'room', 'building'), render)
 
 @app.route('/my_reservations')
 def my_reservations():
-    # Query 1: Reservations per day (by check-in date) - limited to 10
-    reservations = query_db('''
-        SELECT
-        date(r.startDateTime) AS day,
-        COUNT(*) AS num_reservations
-        FROM reservation AS r
-        GROUP BY date(r.startDateTime)
-        ORDER BY day DESC
-        LIMIT 10
-    ''')
+    reservations = query_db(SQL_RECENT_RESERVATIONS)
     total_reservations = len(reservations) if reservations else 0
     return render_template('my_reservations.html', reservations=reservations, total_reservations=total_reservations)
 
 @app.route('/book')
 def book():
-    # Get room types for dropdown (both sleeping rooms and meeting spaces)
-    room_types = query_db('''
-        SELECT DISTINCT rt.roomType, 'room' AS type_category
-        FROM room_type AS rt
-        ORDER BY rt.roomType
-    ''')
-    meeting_space_types = query_db('''
-        SELECT DISTINCT ms.spaceType AS roomType, 'meeting' AS type_category
-        FROM meeting_space AS ms
-        ORDER BY ms.spaceType
-    ''')
-    # Combine both lists
-    all_types = room_types + meeting_space_types
+    all_types = query_db(SQL_BOOKING_TYPES)
     return render_template('book.html', all_types=all_types)
 
 @app.route('/confirmation')
@@ -139,35 +476,27 @@ def management_login():
 
 @app.route('/staff_roster')
 def staff_roster():
-    # Query staff list with their information
-    staff = query_db('''
-        SELECT s.staffId, s.firstName, s.lastName, s.email, s.phone,
-               s.role, s.department, s.hireDate, s.isActive
-        FROM staff AS s
-        ORDER BY s.department, s.lastName, s.firstName
-    ''')
-    # Calculate statistics
-    total_staff = len(staff) if staff else 0
-    active_staff = len([s for s in staff if s.get('isActive')]) if staff else 0
-    return render_template('staff_roster.html', staff=staff, total_staff=total_staff, active_staff=active_staff)
+    def render():
+        # Calculate statistics (same read transaction as the streamed rows)
+        get_db().execute("BEGIN")
+        stats = query_db(SQL_STAFF_STATS, one=True)
+        staff = iter_db(SQL_STAFF_ROSTER)
+        return stream_page('staff_roster.html', staff=staff, total_staff=stats['total_staff'],
+                           active_staff=stats['active_staff'])
+    return conditional_page(('staff',), render)
+
+@cache.memoize(timeout=60)
+def _card_swipe_rows():
+    rows = query_db(SQL_CARD_SWIPES)
+    return [dict(row) for row in rows]   # Row objects can't be pickled into the cache
 
 @app.route('/card_management')
 def card_management():
-    # Query 8: Staff door-reader swipes by department and reader location
-    staff_cards = query_db('''
-        SELECT s.department, rd.location,
-        COUNT(*) AS staff_swipes
-        FROM reading_info AS ri
-        JOIN staff_card_assignment AS sca ON sca.staffcardId = ri.staffcardId
-        JOIN staff AS s ON s.staffId = sca.staffId
-        JOIN readers AS rd ON rd.readersId = ri.readerID
-        GROUP BY s.department, rd.location
-        ORDER BY staff_swipes DESC
-    ''')
-    # Calculate statistics
-    total_swipes = sum(s.get('staff_swipes', 0) for s in staff_cards) if staff_cards else 0
-    departments = len(set(s.get('department') for s in staff_cards if s.get('department'))) if staff_cards else 0
-    locations = len(set(s.get('location') for s in staff_cards if s.get('location'))) if staff_cards else 0
+    staff_cards = _card_swipe_rows()
+    # Statistics come back on every row
+    total_swipes = staff_cards[0]['total_swipes'] if staff_cards else 0
+    departments = staff_cards[0]['departments'] if staff_cards else 0
+    locations = staff_cards[0]['locations'] if staff_cards else 0
     return render_template('card_management.html', staff_cards=staff_cards, 
                           total_swipes=total_swipes, departments=departments, locations=locations)
 
@@ -182,137 +511,118 @@ def employee_login():
 
 @app.route('/employee/rooms')
 def employee_rooms():
-    # Query 7: Open customer requests by request type
-    forum_posts = query_db('''
-        SELECT cr.depositStatus,
-        COUNT(*) AS open_requests
-        FROM customer_requests AS cr
-        WHERE cr.resolved = 'N'
-        GROUP BY cr.depositStatus
-        ORDER BY open_requests DESC
-    ''')
-    # Query 3: Average stay length by room type
-    room_types = query_db('''
-        SELECT rt.roomType,
-        AVG(julianday(r.endDateTime) - julianday(r.startDateTime)) AS avg_nights,
-        COUNT(*) AS num_room_bookings
-        FROM room_type AS rt
-        JOIN room AS rm ON rm.roomTypeId = rt.roomTypeId
-        JOIN reservation_room AS rr ON rr.roomId = rm.roomId
-        JOIN reservation AS r ON r.reservationId = rr.reservationId
-        GROUP BY rt.roomType
-        ORDER BY avg_nights DESC
-    ''')
-    # Query 6: Meeting-space events by space type
-    meeting_spaces_events = query_db('''
-        SELECT ms.spaceType,
-        COUNT(DISTINCT er.eventId) AS events_count
-        FROM meeting_space AS ms
-        LEFT JOIN reservation_room AS rr ON rr.roomId = ms.roomId
-        LEFT JOIN event_reservation AS er ON er.reservationId = rr.reservationId
-        LEFT JOIN event AS e ON e.eventId = er.eventId
-        GROUP BY ms.spaceType
-        ORDER BY ms.spaceType
-    ''')
-    # Calculate statistics
-    total_requests = sum(f.get('open_requests', 0) for f in forum_posts) if forum_posts else 0
-    total_bookings = sum(r.get('num_room_bookings', 0) for r in room_types) if room_types else 0
-    total_events = sum(m.get('events_count', 0) for m in meeting_spaces_events) if meeting_spaces_events else 0
+    # All three queries read from one snapshot: a single BEGIN/COMMIT on the request connection
+    conn = get_db()
+    with conn:
+        conn.execute("BEGIN")
+        forum_posts = query_db(SQL_OPEN_REQUESTS, conn=conn)
+        room_types = query_db(SQL_STAY_LENGTH, conn=conn)
+        meeting_spaces_events = query_db(SQL_SPACE_EVENTS, conn=conn)
+    # Statistics come back on every row
+    total_requests = forum_posts[0]['total_requests'] if forum_posts else 0
+    total_bookings = room_types[0]['total_bookings'] if room_types else 0
+    total_events = meeting_spaces_events[0]['total_events'] if meeting_spaces_events else 0
     return render_template('employee_rooms.html', forum_posts=forum_posts, room_types=room_types, 
                           meeting_spaces_events=meeting_spaces_events, total_requests=total_requests, 
                           total_bookings=total_bookings, total_events=total_events)
 
 @app.route('/employee/customer_cards')
 def employee_customer_cards():
-    # Query 5: Revenue by customer (billing totals)
-    customer_cards = query_db('''
-        SELECT c.customerId,
-        c.lastName AS last_name,
-        c.firstName AS first_name,
-        COUNT(*) AS bills,
-        SUM(b.totalAmount) AS total_billed
-        FROM billing AS b
-        JOIN customer AS c ON c.customerId = b.customerId
-        GROUP BY c.customerId, c.lastName, c.firstName
-        ORDER BY total_billed DESC
-    ''')
-    total_customers = len(customer_cards) if customer_cards else 0
-    total_revenue = sum(c.get('total_billed', 0) for c in customer_cards) if customer_cards else 0
-    return render_template('employee_customer_cards.html', customer_cards=customer_cards, 
-                          total_customers=total_customers, total_revenue=total_revenue)
+    totals = _customer_billing_totals()
+    total_customers = totals['total_customers']
+    total_revenue = totals['total_revenue']
+    page, size, total_pages = page_args(total_customers)
+    customer_cards = _customer_billing_rows(page, size)
+    return render_template('employee_customer_cards.html', customer_cards=customer_cards,
+                          total_customers=total_customers, total_revenue=total_revenue,
+                          page=page, size=size, total_pages=total_pages)
+
+@cache.memoize(timeout=60)
+def _room_list_rows():
+    rows = query_db(SQL_ROOM_STATUS_COUNTS)
+    return [dict(row) for row in rows]   # Row objects can't be pickled into the cache
 
 @app.route('/employee/room_list')
 def employee_room_list():
-    # Query 2: Room counts by status for each building
-    rooms = query_db('''
-        SELECT b.buildingName,
-        rs.status AS room_status,
-        COUNT(*) AS num_rooms
-        FROM building AS b
-        JOIN room AS rm ON rm.buildingId = b.buildingId
-        JOIN room_status AS rs ON rs.roomStatusId = rm.roomStatusId
-        GROUP BY b.buildingName, rs.status
-        ORDER BY b.buildingName, num_rooms DESC
-    ''')
-    total_rooms = sum(r.get('num_rooms', 0) for r in rooms) if rooms else 0
-    available_rooms = sum(r.get('num_rooms', 0) for r in rooms if r.get('room_status') == 'available') if rooms else 0
+    rooms = _room_list_rows()
+    total_rooms = rooms[0]['total_rooms'] if rooms else 0
+    available_rooms = rooms[0]['available_rooms'] if rooms else 0
     return render_template('employee_room_list.html', rooms=rooms, total_rooms=total_rooms, available_rooms=available_rooms)
 
+@cache.memoize(timeout=60)
+def _reservation_day_rows():
+    rows = query_db(SQL_RESERVATIONS_PER_DAY)
+    return [dict(row) for row in rows]   # Row objects can't be pickled into the cache
+
 @app.route('/employee/reservations')
 def employee_reservations_page():
-    # Query 1: Reservations per day (by check-in date)
-    reservations = query_db('''
-        SELECT
-        date(r.startDateTime) AS day,
-        COUNT(*) AS num_reservations
-        FROM reservation AS r
-        GROUP BY date(r.startDateTime)
-        ORDER BY day
-    ''')
-    total_reservations = sum(r.get('num_reservations', 0) for r in reservations) if reservations else 0
-    total_days = len(reservations) if reservations else 0
+    reservations = _reservation_day_rows()
+    total_reservations = reservations[0]['total_reservations'] if reservations else 0
+    total_days = reservations[0]['total_days'] if reservations else 0
     avg_per_day = total_reservations / total_days if total_days > 0 else 0
     return render_template('employee_reservations.html', reservations=reservations, 
                           total_reservations=total_reservations, total_days=total_days, avg_per_day=avg_per_day)
 
+@cache.memoize(timeout=60)
+def _revenue_rows():
+    rows = query_db(SQL_MONTHLY_REVENUE)
+    return [dict(row) for row in rows]   # Row objects can't be pickled into the cache
+
 @app.route('/employee/revenue')
 def employee_revenue():
-    # Query 4: Monthly revenue from transactions
-    revenue = query_db('''
-        SELECT
-        CAST(strftime('%%Y', t.transactionDate) AS INTEGER) AS yr,
-        CAST(strftime('%%m', t.transactionDate) AS INTEGER) AS mo,
-        SUM(t.amount) AS total_revenue,
-        COUNT(*) AS num_tx
-        FROM transaction AS t
-        GROUP BY strftime('%%Y', t.transactionDate), strftime('%%m', t.transactionDate)
-        ORDER BY yr, mo
-    ''')
-    total_revenue = sum(r.get('total_revenue', 0) for r in revenue) if revenue else 0
-    total_transactions = sum(r.get('num_tx', 0) for r in revenue) if revenue else 0
-    months_tracked = len(revenue) if revenue else 0
+    revenue = _revenue_rows()
+    total_revenue = revenue[0]['all_revenue'] if revenue else 0
+    total_transactions = revenue[0]['all_transactions'] if revenue else 0
+    months_tracked = revenue[0]['months_tracked'] if revenue else 0
     return render_template('employee_revenue.html', revenue=revenue, 
                           total_revenue=total_revenue, total_transactions=total_transactions, months_tracked=months_tracked)
 
 @app.route('/employee/rooms_never_reserved')
 def rooms_never_reserved():
-    # Query 9: Rooms that have never been reserved
-    rooms = query_db('''
-        SELECT b.buildingName, rm.roomNumber
-        FROM building AS b
-        JOIN room AS rm ON rm.buildingId = b.buildingId
-        LEFT JOIN reservation_room AS rr ON rr.roomId = rm.roomId
-        WHERE rr.roomId IS NULL
-        ORDER BY b.buildingName, rm.roomNumber
-    ''')
+    rooms = query_db(SQL_ROOMS_NEVER_RESERVED)
     total_unused = len(rooms) if rooms else 0
     return render_template('rooms_never_reserved.html', rooms=rooms, total_unused=total_unused)
 
 
-@app.errorhandler(Exception)
+# requests slower than this are logged so hotspots show up without a profiler
+SLOW_REQUEST_MS = 100
+
+@app.before_request
+def start_timer():
+    g._start = time.perf_counter()
+
+@app.after_request
+def log_slow_request(response):
+    # streamed pages finish rendering after this runs, so their time covers the queries issued up front
+    elapsed_ms = (time.perf_counter() - g.pop('_start', time.perf_counter())) * 1000
+    if elapsed_ms > SLOW_REQUEST_MS:
+        app.logger.warning("slow request %s %s: %.0f ms", request.method, request.path, elapsed_ms)
+    return response
+
+
+def is_db_busy(e):
+    # SQLITE_BUSY / SQLITE_LOCKED (including extended codes) are transient; everything else is a real fault
+    code = getattr(e, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (5, 6)
+    return 'locked' in str(e) or 'busy' in str(e)
+
+@app.errorhandler(sqlite3.OperationalError)
+def handle_db_error(e):
+    if not is_db_busy(e):
+        raise e   # bad SQL, missing table or db file: normal 500 path, traceback logged
+    # no template render: answer fast and leave a log line for monitoring
+    app.logger.error("SQLite busy on %s: %s", request.path, e)
+    return 'DB busy', 503
+
+@app.errorhandler(HTTPException)
 def handle_error(e):
-    return render_template('error.html', error=e)
+    return render_template('error.html', error=e), e.code
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    # the Werkzeug dev server is for local work only; production runs under gunicorn (see gunicorn.conf.py)
+    if DEBUG:
+        app.run(debug=True, port=5001)
+    else:
+        print("Run with FLASK_ENV=dev for the dev server, or: gunicorn -c gunicorn.conf.py app:app")
@@ -0,0 +1,9 @@
+# Production server config: gunicorn -c gunicorn.conf.py app:app  (run from app-groupL/)
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5001')
+workers = 2 * (os.cpu_count() or 1) + 1
+worker_class = 'gthread'
+threads = 4
+# import app.py once in the master so init_db (WAL, indexes, triggers) runs a single time before forking
+preload_app = True